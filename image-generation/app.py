@@ -10,6 +10,12 @@ from services.replicate_editor import ReplicateImageEditor
 from utils.image_utils import persist_data_url_image, is_data_url
 
 
+# Compiled once at import; extract_user_prompt runs on every /process call.
+_INSTRUCTION_QUOTED_RE = re.compile(r'Instruction:\s*["\']([^"\']+)["\']', re.IGNORECASE)
+_INSTRUCTION_BARE_RE = re.compile(r'Instruction:\s*(.+?)(?:\.|$)', re.IGNORECASE)
+_DO_NOT_MODIFY_RE = re.compile(r'\s*Do not modify.*$', re.IGNORECASE)
+
+
 def extract_user_prompt(full_prompt):
     """
     Extract the clean user instruction from technical prompt with region specifications.
@@ -22,16 +28,16 @@ def extract_user_prompt(full_prompt):
     Output: 'Generate a cat'
     """
     # Try to extract from 'Instruction: "..."' pattern
-    match = re.search(r'Instruction:\s*["\']([^"\']+)["\']', full_prompt, re.IGNORECASE)
+    match = _INSTRUCTION_QUOTED_RE.search(full_prompt)
     if match:
         return match.group(1).strip()
 
     # Try to extract from 'Instruction: ...' pattern (without quotes)
-    match = re.search(r'Instruction:\s*(.+?)(?:\.|$)', full_prompt, re.IGNORECASE)
+    match = _INSTRUCTION_BARE_RE.search(full_prompt)
     if match:
         instruction = match.group(1).strip()
         # Remove trailing "Do not modify" clause if present
-        instruction = re.sub(r'\s*Do not modify.*$', '', instruction, flags=re.IGNORECASE)
+        instruction = _DO_NOT_MODIFY_RE.sub('', instruction)
         return instruction.strip()
 
     # If no "Instruction:" pattern found, return the full prompt
@@ -1,9 +1,18 @@
 # Optimized prompts for p-image-edit
 # Key: "maintaining the same" tells model to preserve unmentioned attributes
 
+import functools
+
+# Built once; appended to every editing instruction.
+_PRESERVATION_SUFFIX = ", maintaining the same style, color, size, shape, font, case, position, lighting, and background for everything not explicitly changed"
+
+
 def get_editing_prompt(user_task):
-    return f"{user_task}, maintaining the same style, color, size, shape, font, case, position, lighting, and background for everything not explicitly changed"
+    return user_task + _PRESERVATION_SUFFIX
 
 
+# Retried and batch edits reuse the same instruction, so memoize the
+# composed prompt; keys are short user strings, so the footprint is small.
+@functools.lru_cache(maxsize=512)
 def get_model_optimized_prompt(user_task, model):
     return get_editing_prompt(user_task)
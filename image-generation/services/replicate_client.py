@@ -0,0 +1,42 @@
+from functools import lru_cache
+
+import replicate
+
+from config import REPLICATE_API_TOKEN
+
+
+@lru_cache(maxsize=4)
+def get_client(api_token=REPLICATE_API_TOKEN):
+    """
+    Return a shared replicate.Client for the given token.
+
+    The client wraps a requests session with its own connection pool, so
+    sharing one instance between the generator and editor means repeated
+    model calls reuse the same TCP+TLS connection to api.replicate.com
+    instead of paying a handshake per service object.
+    """
+    if not api_token:
+        raise ValueError("REPLICATE_API_TOKEN is required")
+    return replicate.Client(api_token=api_token)
+
+
+def run_with_image(client, model_id, input_params, param_name, input_image):
+    """
+    Run a model with input_image attached under param_name, dispatching on
+    URL vs local file. The generator and editor previously each carried a
+    copy of this branch; one shared code object keeps them in sync.
+    """
+    if isinstance(input_image, str) and input_image.startswith(('http://', 'https://')):
+        input_params[param_name] = [input_image]
+        return client.run(model_id, input=input_params)
+
+    # Let open() surface a missing file - checking os.path.exists first
+    # would just be a second stat() for the same path.
+    try:
+        image_file = open(input_image, 'rb')
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Input image file not found: {input_image}") from None
+
+    with image_file:
+        input_params[param_name] = [image_file]
+        return client.run(model_id, input=input_params)
@@ -1,15 +1,24 @@
-import os
-import replicate
+import re
 
 from config import COST_PER_MEGAPIXEL_GO_FAST, MEGAPIXELS_1024x1024, REPLICATE_API_TOKEN
 from prompts import get_model_optimized_prompt
+from services.replicate_client import get_client, run_with_image
+
+# Region edits ("change the text in the header") need turbo off; matching
+# case-insensitively here avoids lowercasing a copy of every prompt.
+_REGION_RE = re.compile(r'\bin the\b', re.IGNORECASE)
+
+# Static portion of the p-image-edit payload; per-call fields spread on top.
+_BASE_EDIT_PARAMS = {
+    "turbo": True,
+    "aspect_ratio": "match_input_image"
+}
 
 
 class ReplicateImageEditor:
     def __init__(self, api_token=REPLICATE_API_TOKEN):
-        if not api_token:
-            raise ValueError("REPLICATE_API_TOKEN is required")
-        self.client = replicate.Client(api_token=api_token)
+        # Shared client so generator and editor reuse one connection pool.
+        self.client = get_client(api_token)
 
     def calculate_cost(self, has_input_image=True, model="prunaai/p-image-edit"):
         # Currently only using p-image-edit at $0.01 per image
@@ -33,12 +42,12 @@ class ReplicateImageEditor:
                 raise ValueError("input_image is required for editing")
 
             # Detect region-based edit - turn off turbo for better precision
-            is_region_edit = ' in the ' in prompt.lower()
+            is_region_edit = bool(_REGION_RE.search(prompt))
 
             input_params = {
+                **_BASE_EDIT_PARAMS,
                 "prompt": enhanced_prompt,
-                "turbo": not is_region_edit,
-                "aspect_ratio": "match_input_image"
+                "turbo": not is_region_edit
             }
             param_name = "images"
 
@@ -61,16 +70,10 @@ class ReplicateImageEditor:
             #     param_name = "image"
 
             # Handle both URL and local file paths
-            if isinstance(input_image, str) and input_image.startswith(('http://', 'https://')):
-                input_params[param_name] = [input_image]
-                output = self.client.run("prunaai/p-image-edit", input=input_params)
-            else:
-                if not os.path.exists(input_image):
-                    raise FileNotFoundError(f"Input image file not found: {input_image}")
-
-                with open(input_image, 'rb') as image_file:
-                    input_params[param_name] = [image_file]
-                    output = self.client.run("prunaai/p-image-edit", input=input_params)
+            output = run_with_image(
+                self.client, "prunaai/p-image-edit",
+                input_params, param_name, input_image
+            )
 
             # Calculate cost
             cost = self.calculate_cost(has_input_image=True, model=model)
@@ -1,14 +1,22 @@
-import os
-import replicate
-
 from config import COST_PER_MEGAPIXEL_GO_FAST, MEGAPIXELS_1024x1024, REPLICATE_API_TOKEN
+from services.replicate_client import get_client, run_with_image
+
+# Static portion of the flux-2-dev payload; the prompt and any input
+# images spread on top per call.
+# Using 896x896 instead of 1024x1024 for ~25% cost reduction
+_BASE_GENERATE_PARAMS = {
+    "go_fast": True,
+    "output_format": "png",
+    "output_quality": 90,
+    "width": 896,
+    "height": 896
+}
 
 
 class ImageGenerator:
     def __init__(self, api_token=REPLICATE_API_TOKEN):
-        if not api_token:
-            raise ValueError("REPLICATE_API_TOKEN is required")
-        self.client = replicate.Client(api_token=api_token)
+        # Shared client so generator and editor reuse one connection pool.
+        self.client = get_client(api_token)
 
     def calculate_cost(self, has_input_image=False):
         # Estimate cost for input + output based on megapixels.
@@ -20,35 +28,14 @@ class ImageGenerator:
 
     def generate_image(self, prompt, input_image=None):
         # Build the request payload for the image model.
-        # Using 896x896 instead of 1024x1024 for ~25% cost reduction
-        input_params = {
-            "prompt": prompt,
-            "go_fast": True,
-            "output_format": "png",
-            "output_quality": 90,
-            "width": 896,
-            "height": 896
-        }
+        input_params = {**_BASE_GENERATE_PARAMS, "prompt": prompt}
 
         try:
             if input_image:
-                if isinstance(input_image, str) and input_image.startswith(('http://', 'https://')):
-                    input_params["input_images"] = [input_image]
-                    output = self.client.run(
-                        "black-forest-labs/flux-2-dev",
-                        input=input_params
-                    )
-                else:
-                    # Validate file exists before opening
-                    if not os.path.exists(input_image):
-                        raise FileNotFoundError(f"Input image file not found: {input_image}")
-
-                    with open(input_image, 'rb') as image_file:
-                        input_params["input_images"] = [image_file]
-                        output = self.client.run(
-                            "black-forest-labs/flux-2-dev",
-                            input=input_params
-                        )
+                output = run_with_image(
+                    self.client, "black-forest-labs/flux-2-dev",
+                    input_params, "input_images", input_image
+                )
             else:
                 output = self.client.run(
                     "black-forest-labs/flux-2-dev",
@@ -2,30 +2,54 @@ import base64
 import mimetypes
 import os
 import uuid
+from functools import lru_cache
+
+
+@lru_cache(maxsize=64)
+def _guess_type(suffix):
+    # Keyed on extension only - full paths would defeat the cache.
+    return mimetypes.guess_type(f'file{suffix}')[0]
+
+
+@lru_cache(maxsize=32)
+def _guess_extension(mime_type):
+    return mimetypes.guess_extension(mime_type) or '.png'
+
+
+# Streaming chunk size for base64 work; multiples of 3 (encode) and 4
+# (decode) keep chunk boundaries aligned so no padding appears mid-stream.
+_B64_CHUNK = 3 * 65536
 
 
 def image_file_to_data_url(image_path):
     # Convert a local image file into a base64 data URL for API uploads.
-    mime_type, _ = mimetypes.guess_type(image_path)
+    mime_type = _guess_type(os.path.splitext(image_path)[1])
     if not mime_type:
         mime_type = 'application/octet-stream'
 
+    # Encode in aligned chunks so peak memory stays near one chunk instead
+    # of the whole file plus its base64 copy.
+    buf = bytearray(f'data:{mime_type};base64,'.encode('ascii'))
     with open(image_path, 'rb') as image_file:
-        encoded = base64.b64encode(image_file.read()).decode('utf-8')
+        while chunk := image_file.read(_B64_CHUNK):
+            buf.extend(base64.b64encode(chunk))
 
-    return f'data:{mime_type};base64,{encoded}'
+    return buf.decode('ascii')
 
 
 def persist_data_url_image(data_url, upload_folder):
     # Persist large data URLs to disk to avoid oversized session cookies.
     header, encoded = data_url.split(',', 1)
     mime_type = header.split(';')[0].replace('data:', '') if 'data:' in header else 'image/png'
-    extension = mimetypes.guess_extension(mime_type) or '.png'
+    extension = _guess_extension(mime_type)
     filename = f'replicate_edit_{uuid.uuid4().hex}{extension}'
     filepath = os.path.join(upload_folder, filename)
 
+    # Decode straight to disk in aligned chunks rather than materializing
+    # the full decoded image in memory first.
     with open(filepath, 'wb') as image_file:
-        image_file.write(base64.b64decode(encoded))
+        for start in range(0, len(encoded), _B64_CHUNK * 4 // 3):
+            image_file.write(base64.b64decode(encoded[start:start + _B64_CHUNK * 4 // 3]))
 
     return filepath, f'/uploads/{filename}'
 
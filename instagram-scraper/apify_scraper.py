@@ -1,9 +1,37 @@
 import time
 
+import ijson
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from config import APIFY_API_KEY, APIFY_ACTOR_ID, INSTAGRAM_PROFILE, MAX_POSTS, MAX_IMAGES_PER_POST
 
+# One session for the run-start, polling, and dataset calls: keep-alive
+# skips a TLS handshake per request to api.apify.com, and transient 5xx
+# responses retry at the transport layer.
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+))
+_SESSION.headers.update({"Content-Type": "application/json"})
+
+
+def _trim_post(post, max_images):
+    """Cut a post's image lists down to max_images, in place."""
+    # Limit images to MAX_IMAGES_PER_POST
+    if 'images' in post and isinstance(post['images'], list):
+        post['images'] = post['images'][:max_images]
+
+    # Also check for displayUrl and childPosts (carousel posts)
+    if 'childPosts' in post and isinstance(post['childPosts'], list):
+        post['childPosts'] = post['childPosts'][:max_images]
+
+    return post
+
 
 def scrape_instagram_posts():
     """
@@ -22,31 +50,32 @@ def scrape_instagram_posts():
 
     # Start the actor run
     run_url = f"https://api.apify.com/v2/acts/{APIFY_ACTOR_ID}/runs"
-    headers = {
-        "Content-Type": "application/json"
-    }
     params = {
         "token": APIFY_API_KEY
     }
 
     print(f"Starting Apify actor to scrape {INSTAGRAM_PROFILE}...")
-    response = requests.post(run_url, json=actor_input, headers=headers, params=params)
+    response = _SESSION.post(run_url, json=actor_input, params=params)
 
     if response.status_code != 201:
         raise Exception(f"Failed to start actor: {response.text}")
 
-    run_data = response.json()
+    run_data = orjson.loads(response.content)
     run_id = run_data["data"]["id"]
     default_dataset_id = run_data["data"]["defaultDatasetId"]
 
     print(f"Actor run started with ID: {run_id}")
     print("Waiting for actor to finish...")
 
-    # Wait for the actor to finish
+    # Wait for the actor to finish. waitForFinish makes the server hold the
+    # request open until the run completes (or 60s pass), so the common case
+    # is a single call; the backoff only kicks in for long runs.
     status_url = f"https://api.apify.com/v2/acts/{APIFY_ACTOR_ID}/runs/{run_id}"
+    wait_params = {**params, "waitForFinish": 60}
+    delay = 1
     while True:
-        status_response = requests.get(status_url, params=params)
-        status_data = status_response.json()
+        status_response = _SESSION.get(status_url, params=wait_params)
+        status_data = orjson.loads(status_response.content)
         status = status_data["data"]["status"]
 
         if status in ["SUCCEEDED", "FAILED", "ABORTED"]:
@@ -54,33 +83,32 @@ def scrape_instagram_posts():
             break
 
         print(f"Current status: {status}. Waiting...")
-        time.sleep(5)
+        time.sleep(delay)
+        delay = min(30, delay * 2)
 
     if status != "SUCCEEDED":
         raise Exception(f"Actor run failed with status: {status}")
 
-    # Fetch the results from the dataset
+    # Fetch the results from the dataset. The array can be several MB of
+    # post metadata, so stream-parse it one post at a time and trim the
+    # image lists as posts arrive - peak memory stays at one untrimmed
+    # post instead of the whole untrimmed dataset.
     dataset_url = f"https://api.apify.com/v2/datasets/{default_dataset_id}/items"
-    dataset_response = requests.get(dataset_url, params=params)
-
-    if dataset_response.status_code != 200:
-        raise Exception(f"Failed to fetch dataset: {dataset_response.text}")
-
-    posts = dataset_response.json()
-    print(f"Retrieved {len(posts)} posts")
+    with _SESSION.get(dataset_url, params=params, stream=True) as dataset_response:
+        if dataset_response.status_code != 200:
+            raise Exception(f"Failed to fetch dataset: {dataset_response.text}")
 
-    # Process and limit images per post
-    processed_posts = []
-    for post in posts:
-        # Limit images to MAX_IMAGES_PER_POST
-        if 'images' in post and isinstance(post['images'], list):
-            post['images'] = post['images'][:MAX_IMAGES_PER_POST]
+        # Let urllib3 undo any transfer compression before ijson sees the bytes.
+        dataset_response.raw.decode_content = True
 
-        # Also check for displayUrl and childPosts (carousel posts)
-        if 'childPosts' in post and isinstance(post['childPosts'], list):
-            post['childPosts'] = post['childPosts'][:MAX_IMAGES_PER_POST]
+        # Local alias keeps the per-post trim free of module-global lookups.
+        max_images = MAX_IMAGES_PER_POST
+        processed_posts = [
+            _trim_post(post, max_images)
+            for post in ijson.items(dataset_response.raw, 'item', use_float=True)
+        ]
 
-        processed_posts.append(post)
+    print(f"Retrieved {len(processed_posts)} posts")
 
     return processed_posts
 
@@ -0,0 +1,122 @@
+"""Submit analysis prompts through the provider's Batch API.
+
+Batch jobs trade interactivity for roughly half the per-token cost: the
+prompts upload as one JSONL file, the provider schedules the whole set
+together, and a later invocation collects the results.
+"""
+
+import time
+from datetime import datetime
+
+import orjson
+import requests
+
+from config import OPENROUTER_API_KEY, OPENROUTER_API_URL, OPENROUTER_MODEL, OUTPUT_DIR
+
+# The chat-completions URL's sibling batch/file endpoints.
+_API_BASE = OPENROUTER_API_URL.rsplit('/chat/completions', 1)[0]
+_BATCHES_URL = f"{_API_BASE}/batches"
+_FILES_URL = f"{_API_BASE}/files"
+
+_HEADERS = {"Authorization": f"Bearer {OPENROUTER_API_KEY}"}
+
+# Job id persists here so re-runs can collect without retyping it.
+_JOB_FILE = OUTPUT_DIR / "batch_job.json"
+
+# Terminal states that mean the job will never complete.
+_FAILED_STATES = ('failed', 'expired', 'cancelled')
+
+
+def submit_gemini_batch(prompts):
+    """
+    Upload prompts (each a chat-completions content array) as a JSONL batch
+    and start the job. Returns the job id, also saved to batch_job.json.
+    """
+    lines = [
+        orjson.dumps({
+            "custom_id": f"request-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": OPENROUTER_MODEL,
+                "messages": [{"role": "user", "content": content}],
+            },
+        })
+        for i, content in enumerate(prompts, 1)
+    ]
+
+    upload = requests.post(
+        _FILES_URL,
+        headers=_HEADERS,
+        files={"file": ("batch.jsonl", b"\n".join(lines))},
+        data={"purpose": "batch"},
+        timeout=120,
+    )
+    upload.raise_for_status()
+    file_id = orjson.loads(upload.content)["id"]
+
+    response = requests.post(
+        _BATCHES_URL,
+        headers=_HEADERS,
+        json={
+            "input_file_id": file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+        },
+        timeout=60,
+    )
+    response.raise_for_status()
+    job_id = orjson.loads(response.content)["id"]
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    _JOB_FILE.write_bytes(orjson.dumps({
+        "job_id": job_id,
+        "prompt_count": len(prompts),
+        "submitted_at": datetime.now().isoformat(),
+    }))
+
+    return job_id
+
+
+def load_saved_job_id():
+    """Return the job id from the last submission, or None."""
+    if _JOB_FILE.is_file():
+        return orjson.loads(_JOB_FILE.read_bytes()).get("job_id")
+    return None
+
+
+def collect_batch_results(job_id):
+    """
+    Poll the job until it completes (5s, 10s, 20s, ... capped at 60s) and
+    return {custom_id: reply_text} for every finished request.
+    """
+    delay = 5
+    while True:
+        status = requests.get(f"{_BATCHES_URL}/{job_id}", headers=_HEADERS, timeout=60)
+        status.raise_for_status()
+        job = orjson.loads(status.content)
+        state = job.get("status")
+
+        if state == "completed":
+            break
+        if state in _FAILED_STATES:
+            raise Exception(f"Batch job {job_id} ended in state '{state}'")
+
+        print(f"  Batch job {state}, checking again in {delay}s...")
+        time.sleep(delay)
+        delay = min(60, delay * 2)
+
+    output = requests.get(
+        f"{_FILES_URL}/{job['output_file_id']}/content",
+        headers=_HEADERS,
+        timeout=120,
+    )
+    output.raise_for_status()
+
+    results = {}
+    for line in output.content.splitlines():
+        if not line.strip():
+            continue
+        item = orjson.loads(line)
+        results[item["custom_id"]] = item["response"]["body"]["choices"][0]["message"]["content"]
+    return results
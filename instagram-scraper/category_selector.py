@@ -6,64 +6,169 @@ It analyzes the user's content and matches it to the best category from the anal
 """
 
 import re
+import string
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 from typing import Dict, List, Tuple
 
-
-def extract_keywords(text: str) -> List[str]:
+import orjson
+
+# Compiled once at import; both run on every select_category_for_generation
+# call, so the hot path skips re's internal cache lookup per call.
+_DATE_RE = re.compile(
+    r'\b(january|february|march|april|may|june|july|august|september|october|november|december|\d{1,2}/\d{1,2}(/\d{2,4})?)',
+    re.IGNORECASE,
+)
+_CLEAN_RE = re.compile(r"[^\w\s'-]")
+
+# ASCII translation table matching _CLEAN_RE: everything except word
+# characters, whitespace, apostrophes, and hyphens maps to a space.
+# str.translate is a C-level table lookup, so ASCII text (the common case)
+# skips the regex engine; non-ASCII falls back to _CLEAN_RE, whose \\w
+# understands Unicode word characters.
+_KEEP_CHARS = frozenset(string.ascii_lowercase + string.digits + "_'-" + string.whitespace)
+_CLEAN_TABLE = {ord(c): ' ' for c in map(chr, range(128)) if c not in _KEEP_CHARS}
+
+# Keyword families behind the has_* indicators. They all fold into one
+# combined pattern so detect_content_indicators makes a single pass over
+# the text instead of a substring scan per keyword. The lookahead keeps
+# overlapping hits (e.g. 'fact' inside 'impact') matching like the old
+# per-word containment checks did.
+_INDICATOR_KEYWORDS = {
+    'cta': ('apply', 'join', 'sign up', 'register', 'volunteer', 'hiring', 'deadline'),
+    'narrative': ('story', 'experience', 'testimonial', 'journey', 'impact'),
+    'educational': ('learn', 'how to', 'tips', 'guide', 'tutorial', 'fact'),
+    'announcement': ('announcing', 'new', 'launching', 'introducing', 'reminder'),
+}
+_KEYWORD_CLASS = {kw: cls for cls, kws in _INDICATOR_KEYWORDS.items() for kw in kws}
+_INDICATOR_RE = re.compile(
+    r'(?=(' + '|'.join(re.escape(kw) for kw in sorted(_KEYWORD_CLASS, key=len, reverse=True)) + r'))',
+    re.IGNORECASE,
+)
+
+
+# Common stop words to filter out
+_STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for',
+    'from', 'has', 'he', 'in', 'is', 'it', 'its', 'of', 'on',
+    'that', 'the', 'to', 'was', 'will', 'with', 'we', 'our',
+    'you', 'your', 'this', 'these', 'those', 'about'
+})
+
+
+@lru_cache(maxsize=1024)
+def extract_keywords(text: str) -> Tuple[str, ...]:
     """
     Extract meaningful keywords from user text.
-    Removes stop words and returns lowercase tokens.
+    Removes stop words and returns lowercase tokens. Pure function of the
+    text, so results are memoized (hence the tuple return).
     """
-    # Common stop words to filter out
-    stop_words = {
-        'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for',
-        'from', 'has', 'he', 'in', 'is', 'it', 'its', 'of', 'on',
-        'that', 'the', 'to', 'was', 'will', 'with', 'we', 'our',
-        'you', 'your', 'this', 'these', 'those', 'about'
-    }
-
     # Tokenize and clean
     text_lower = text.lower()
     # Remove punctuation except hyphens and apostrophes
-    text_clean = re.sub(r'[^\w\s\'-]', ' ', text_lower)
+    if text_lower.isascii():
+        text_clean = text_lower.translate(_CLEAN_TABLE)
+    else:
+        text_clean = _CLEAN_RE.sub(' ', text_lower)
     words = text_clean.split()
 
     # Filter stop words and short words
-    keywords = [w for w in words if len(w) > 3 and w not in stop_words]
+    keywords = tuple(w for w in words if len(w) > 3 and w not in _STOP_WORDS)
 
     return keywords
 
 
-def calculate_keyword_score(user_keywords: List[str], category_keywords: List[str]) -> float:
+# Memoized per-analysis state, keyed on stable fingerprints of the analysis
+# content rather than stashed inside the analysis dict: the analysis is a
+# JSON document that callers re-serialize and save, so it must stay pure
+# data (frozensets or cache keys written into it would corrupt the saved
+# artifact). Both caches evict oldest-first once full.
+_INDEX_CACHE: Dict[bytes, Dict[str, Tuple[frozenset, List[str]]]] = {}
+_INDEX_CACHE_MAX = 16
+_SELECTION_CACHE: Dict[Tuple[bytes, str], Dict] = {}
+_SELECTION_CACHE_MAX = 1024
+
+
+def _selection_fingerprint(analysis_json: Dict) -> bytes:
+    """Stable key covering the parts of the analysis that drive selection."""
+    return orjson.dumps(
+        (
+            analysis_json.get('generation_category_selector', {}),
+            analysis_json.get('analysis_metadata', {}),
+            [cat.get('category_id') for cat in analysis_json.get('categories', [])],
+        ),
+        option=orjson.OPT_SORT_KEYS,
+    )
+
+
+def _precompute_category_index(selector_data: Dict) -> Dict[str, Tuple[frozenset, List[str]]]:
+    """
+    Build {category_id: (exact keyword frozenset, keyword list)} from the
+    selector's selection_logic, lowercased once. Cached at module level so
+    repeated selections against the same analysis skip the rebuild.
+    """
+    key = orjson.dumps(selector_data.get('selection_logic', {}), option=orjson.OPT_SORT_KEYS)
+    index = _INDEX_CACHE.get(key)
+    if index is None:
+        # Substring list sorted shortest-first: short keywords are the
+        # likeliest containment hits, so the fallback scan exits sooner.
+        index = {
+            category_id: (frozenset(kws), sorted(kws, key=len))
+            for category_id, logic in selector_data.get('selection_logic', {}).items()
+            for kws in [[kw.lower() for kw in logic.get('keywords', [])]]
+        }
+        if len(_INDEX_CACHE) >= _INDEX_CACHE_MAX:
+            _INDEX_CACHE.pop(next(iter(_INDEX_CACHE)))
+        _INDEX_CACHE[key] = index
+    return index
+
+
+def calculate_keyword_score(user_keywords: Tuple[str, ...], category_index: Tuple[frozenset, List[str]]) -> float:
     """
     Calculate match score based on keyword overlap.
+    category_index is one entry from _precompute_category_index. Exact hits
+    resolve with an O(1) set probe; only unmatched user keywords fall back
+    to the O(C) substring scan.
     Returns a score between 0 and 1.
     """
+    exact_keywords, category_keywords = category_index
     if not user_keywords or not category_keywords:
         return 0.0
 
     # Count matches
-    matches = sum(1 for uk in user_keywords if any(ck in uk or uk in ck for ck in category_keywords))
+    matches = 0
+    for uk in user_keywords:
+        if uk in exact_keywords:
+            matches += 1
+            continue
+        for ck in category_keywords:
+            if ck in uk or uk in ck:
+                matches += 1
+                break
 
-    # Normalize by user keywords length
-    score = matches / len(user_keywords)
+    if matches == len(user_keywords):
+        # Full coverage - the score can only be the cap.
+        return 1.0
 
-    return min(score, 1.0)  # Cap at 1.0
+    # Normalize by user keywords length
+    return matches / len(user_keywords)
 
 
+@lru_cache(maxsize=1024)
 def detect_content_indicators(text: str) -> Dict[str, bool]:
     """
     Detect content indicators in user text.
-    Returns a dict of detected indicators.
+    Returns a dict of detected indicators. Pure function of the text, so
+    results are memoized; treat the returned dict as read-only.
     """
-    text_lower = text.lower()
+    hits = {_KEYWORD_CLASS[m.group(1).lower()] for m in _INDICATOR_RE.finditer(text)}
 
     return {
-        "has_date": bool(re.search(r'\b(january|february|march|april|may|june|july|august|september|october|november|december|\d{1,2}/\d{1,2}(/\d{2,4})?)', text_lower)),
-        "has_cta": any(word in text_lower for word in ['apply', 'join', 'sign up', 'register', 'volunteer', 'hiring', 'deadline']),
-        "has_narrative": any(word in text_lower for word in ['story', 'experience', 'testimonial', 'journey', 'impact']),
-        "has_educational": any(word in text_lower for word in ['learn', 'how to', 'tips', 'guide', 'tutorial', 'fact']),
-        "has_announcement": any(word in text_lower for word in ['announcing', 'new', 'launching', 'introducing', 'reminder']),
+        "has_date": bool(_DATE_RE.search(text)),
+        "has_cta": 'cta' in hits,
+        "has_narrative": 'narrative' in hits,
+        "has_educational": 'educational' in hits,
+        "has_announcement": 'announcement' in hits,
         "has_question": '?' in text
     }
 
@@ -124,6 +229,58 @@ def select_category_for_generation(user_text: str, analysis_json: Dict) -> Dict:
           "category_data": dict (full category design_system and metadata)
         }
     """
+    if analysis_json:
+        # Selection is deterministic per (text, analysis), so repeat calls
+        # for the same post skip the scoring loop. The cache lives at
+        # module level, keyed on the analysis fingerprint, so the caller's
+        # JSON document is never mutated.
+        key = (_selection_fingerprint(analysis_json), user_text)
+        result = _SELECTION_CACHE.get(key)
+        if result is None:
+            result = _select_category_uncached(user_text, analysis_json)
+            if len(_SELECTION_CACHE) >= _SELECTION_CACHE_MAX:
+                _SELECTION_CACHE.pop(next(iter(_SELECTION_CACHE)))
+            _SELECTION_CACHE[key] = result
+        return result
+
+    return _select_category_uncached(user_text, analysis_json)
+
+
+def _fallback_to_recommendation(analysis_json: Dict, categories: List[Dict], best_score: float) -> Dict:
+    """
+    Low-confidence fallback: use the analysis' recommended category if
+    present, otherwise the primary category.
+    """
+    metadata = analysis_json.get('analysis_metadata', {})
+    recommendation = metadata.get('recommended_category_for_generation', {})
+    recommended_id = recommendation.get('category_id')
+
+    if recommended_id:
+        recommended_cat = next((cat for cat in categories if cat.get('category_id') == recommended_id), None)
+
+        return {
+            "selected_category_id": recommended_id,
+            "confidence_score": best_score,
+            "reasoning": f"Low confidence match (score: {best_score:.2f}). Using recommended: {recommendation.get('reasoning', 'Most recent post style')}",
+            "category_data": recommended_cat,
+            "selection_method": "fallback_to_recommendation"
+        }
+
+    # Fallback to primary category if no recommendation
+    primary_id = metadata.get('primary_category')
+    primary_cat = next((cat for cat in categories if cat.get('category_id') == primary_id), None)
+
+    return {
+        "selected_category_id": primary_id,
+        "confidence_score": best_score,
+        "reasoning": f"Low confidence match (score: {best_score:.2f}). Defaulting to primary category (most recent post)",
+        "category_data": primary_cat,
+        "selection_method": "fallback_to_primary"
+    }
+
+
+def _select_category_uncached(user_text: str, analysis_json: Dict) -> Dict:
+    """Run the full scoring pass; select_category_for_generation caches this."""
     if not analysis_json or 'generation_category_selector' not in analysis_json:
         return {
             "selected_category_id": None,
@@ -147,7 +304,13 @@ def select_category_for_generation(user_text: str, analysis_json: Dict) -> Dict:
     user_keywords = extract_keywords(user_text)
     user_indicators = detect_content_indicators(user_text)
 
+    # Trivial input (empty/stop-word-only text with no indicators) scores
+    # zero everywhere; skip the loop and go straight to the fallback.
+    if not user_keywords and not any(user_indicators.values()):
+        return _fallback_to_recommendation(analysis_json, categories, 0.0)
+
     # Score each category
+    category_index = _precompute_category_index(selector_data)
     category_scores = []
 
     for category_id in selector_data['available_categories']:
@@ -155,11 +318,10 @@ def select_category_for_generation(user_text: str, analysis_json: Dict) -> Dict:
             continue
 
         logic = selector_data['selection_logic'][category_id]
-        category_keywords = logic.get('keywords', [])
         category_indicators = logic.get('content_indicators', [])
 
         # Calculate scores
-        keyword_score = calculate_keyword_score(user_keywords, category_keywords)
+        keyword_score = calculate_keyword_score(user_keywords, category_index[category_id])
         indicator_score = calculate_indicator_score(user_indicators, category_indicators)
 
         # Combined score (weighted)
@@ -187,32 +349,7 @@ def select_category_for_generation(user_text: str, analysis_json: Dict) -> Dict:
 
     # Apply minimum threshold
     if best_score < 0.3:
-        # Use recommended category if available, otherwise fall back to primary
-        recommendation = analysis_json.get('analysis_metadata', {}).get('recommended_category_for_generation', {})
-        recommended_id = recommendation.get('category_id')
-
-        if recommended_id:
-            recommended_cat = next((cat for cat in categories if cat.get('category_id') == recommended_id), None)
-
-            return {
-                "selected_category_id": recommended_id,
-                "confidence_score": best_score,
-                "reasoning": f"Low confidence match (score: {best_score:.2f}). Using recommended: {recommendation.get('reasoning', 'Most recent post style')}",
-                "category_data": recommended_cat,
-                "selection_method": "fallback_to_recommendation"
-            }
-        else:
-            # Fallback to primary category if no recommendation
-            primary_id = analysis_json.get('analysis_metadata', {}).get('primary_category')
-            primary_cat = next((cat for cat in categories if cat.get('category_id') == primary_id), None)
-
-            return {
-                "selected_category_id": primary_id,
-                "confidence_score": best_score,
-                "reasoning": f"Low confidence match (score: {best_score:.2f}). Defaulting to primary category (most recent post)",
-                "category_data": primary_cat,
-                "selection_method": "fallback_to_primary"
-            }
+        return _fallback_to_recommendation(analysis_json, categories, best_score)
 
     # Find the category data
     selected_cat = next((cat for cat in categories if cat.get('category_id') == best_id), None)
@@ -245,6 +382,22 @@ def select_category_for_generation(user_text: str, analysis_json: Dict) -> Dict:
     }
 
 
+def select_categories_batch(texts: List[str], analysis_json: Dict) -> List[Dict]:
+    """
+    Select categories for many texts against one analysis.
+
+    Small batches run serially (and share the per-analysis caches); large
+    ones fan the pure-Python scoring out over a process pool, where each
+    worker builds the keyword index once into its own module cache.
+    """
+    if len(texts) < 32:
+        return [select_category_for_generation(text, analysis_json) for text in texts]
+
+    score_one = partial(_select_category_uncached, analysis_json=analysis_json)
+    with ProcessPoolExecutor() as executor:
+        return list(executor.map(score_one, texts, chunksize=32))
+
+
 def print_category_selection(selection_result: Dict):
     """
     Pretty-print category selection results.
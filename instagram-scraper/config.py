@@ -27,9 +27,32 @@ MAX_IMAGES_PER_POST = 10
 # Apify Actor ID (using the specific actor ID from the URL)
 APIFY_ACTOR_ID = "shu8hvrXbJbY3Eb9W"
 
+# Optional post metadata fields for analysis prompts. The model rarely uses
+# URLs or timestamps, so they are excluded by default to save prompt tokens.
+INCLUDE_POST_URLS = os.getenv('INCLUDE_POST_URLS', 'false').lower() == 'true'
+INCLUDE_POST_TIMESTAMPS = os.getenv('INCLUDE_POST_TIMESTAMPS', 'false').lower() == 'true'
+
 # OpenRouter settings
 OPENROUTER_MODEL = "google/gemini-3-flash-preview"
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 
 # Output settings
 OUTPUT_DIR = Path(__file__).parent / "output"
+
+# On-disk cache for downloaded + compressed images (shared across runs).
+IMAGE_CACHE_DIR = Path.home() / '.cache' / 'ig-scraper'
+
+# Force inline base64 image payloads instead of letting the model gateway
+# fetch CDN URLs server-side (useful when the CDN 403s hotlink requests).
+INLINE_IMAGES = os.getenv('INLINE_IMAGES', 'false').lower() == 'true'
+
+# Reuse cached LLM responses for identical (model, prompt, images) requests.
+USE_LLM_CACHE = os.getenv('USE_LLM_CACHE', 'true').lower() == 'true'
+
+# Upper bound on simultaneous OpenRouter requests during per-category
+# analysis. Raise it if your key's rate limit allows more in flight.
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '10'))
+
+# Requests-per-minute budget for OpenRouter; calls queue client-side once
+# the rolling window is full instead of drawing 429s.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '60'))
@@ -1,14 +1,178 @@
-import base64
+import asyncio
+import hashlib
 import json
+import math
+import operator
+import os
 import re
-import time
+import threading
+from collections import defaultdict
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from io import BytesIO
 
+import orjson
+import pybase64
 import requests
 from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    OPENROUTER_API_KEY,
+    OPENROUTER_API_URL,
+    OPENROUTER_MODEL,
+    MAX_IMAGES_PER_POST,
+    INCLUDE_POST_URLS,
+    INCLUDE_POST_TIMESTAMPS,
+    IMAGE_CACHE_DIR,
+    USE_LLM_CACHE,
+    INLINE_IMAGES,
+    LLM_MAX_CONCURRENCY,
+    LLM_REQUESTS_PER_MINUTE,
+)
+from rate_limiter import RateLimiter
+
+
+# Common keyword patterns for different purposes, frozen once at import so
+# build_category_selector doesn't rebuild them on every call.
+_PURPOSE_KEYWORDS = {
+    "call_to_action": frozenset(["apply", "join", "recruit", "volunteer", "hiring", "position", "sign up", "register"]),
+    "announcement": frozenset(["deadline", "announcement", "reminder", "save the date", "upcoming", "launching", "new"]),
+    "storytelling": frozenset(["story", "impact", "event", "community", "volunteers", "testimonial", "experience"]),
+    "educational": frozenset(["learn", "guide", "how to", "tips", "tutorial", "facts", "information"]),
+    "testimonial": frozenset(["testimonial", "review", "feedback", "experience", "story", "success"]),
+    "behind_the_scenes": frozenset(["behind", "team", "process", "making", "work", "volunteers"]),
+    "product": frozenset(["product", "service", "feature", "offer", "sale", "discount", "pricing"])
+}
+
+# Splits category names on spaces and common separators.
+_NAME_SPLIT_RE = re.compile(r'[\s_-]+')
+
+# Matches a model reply wrapped in a markdown code fence (with or without the
+# "json" tag, tolerating a missing closing fence), capturing the body.
+_FENCE_RE = re.compile(r'^```(?:json)?\s*(.*?)\s*(?:```)?\s*$', re.DOTALL)
+
+# Raw technical values that should never appear in a prompt_template.
+_HEX_RE = re.compile(r'#[0-9A-Fa-f]{3,8}')
+_PCT_RE = re.compile(r'\d+%')
+_DEG_RE = re.compile(r'-?\d+\s*(?:degrees?|deg|°)', re.IGNORECASE)
+_PX_RE = re.compile(r'\d+\s*px', re.IGNORECASE)
+
+# Post metadata fields sent to the model; itemgetter fetches all of them in a
+# single C-level call per post. url/timestamp are gated behind env flags.
+_POST_FIELDS = tuple(
+    field for field in ('url', 'caption', 'type', 'timestamp')
+    if (field != 'url' or INCLUDE_POST_URLS)
+    and (field != 'timestamp' or INCLUDE_POST_TIMESTAMPS)
+)
+_GET_POST_FIELDS = operator.itemgetter(*_POST_FIELDS)
+
+# Shared session so concurrent requests reuse keep-alive connections (to the
+# Instagram CDN and to OpenRouter) instead of opening a fresh TLS connection
+# per call. All retrying lives here: exponential backoff at the connection
+# pool layer, retried 429/5xx statuses (POST included - chat completions are
+# safe to reissue), and OpenRouter's Retry-After headers honored.
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['HEAD', 'GET', 'POST'],
+        respect_retry_after_header=True,
+    ),
+))
+
+# One limiter shared by every LLM call site, across all worker threads.
+_RATE_LIMITER = RateLimiter(LLM_REQUESTS_PER_MINUTE)
+
+# Bump whenever the analysis prompts change so cached analyses are invalidated.
+PROMPT_VERSION = 1
+
+# In-process cache of parsed category analyses, keyed by category + inputs.
+_ANALYSIS_CACHE = {}
+
+# In-process memo of successful downloads (url -> (base64_data, media_type)),
+# so re-encoding across categories never re-fetches or re-compresses.
+_DOWNLOAD_MEMO = {}
+
+
+# Inline image payloads aim for this combined size per request; the per-image
+# resize bound scales down as the image count grows and up when there are few.
+_TARGET_TOTAL_IMAGE_BYTES = 4 * 1024 * 1024
+_JPEG_BYTES_PER_PIXEL = 0.25  # rough density for JPEG quality 85
+
+
+def _adaptive_max_size(image_count):
+    """Resize bound that keeps image_count compressed JPEGs near the target."""
+    if image_count <= 0:
+        return 800
+    budget_per_image = _TARGET_TOTAL_IMAGE_BYTES / image_count
+    return max(400, min(1024, int(math.sqrt(budget_per_image / _JPEG_BYTES_PER_PIXEL))))
+
+
+def _image_cache_path(url, max_size):
+    """Content-addressed path for a URL's compressed JPEG in the disk cache."""
+    key = hashlib.sha256(f"{url}|{max_size}".encode('utf-8')).hexdigest()
+    return IMAGE_CACHE_DIR / f"{key}.jpg"
+
+
+def _dumps(obj):
+    """Compact JSON string for prompt payloads."""
+    return orjson.dumps(obj).decode('utf-8')
+
+
+# Persistent cache of raw OpenRouter responses, keyed by request content.
+_LLM_CACHE_DIR = IMAGE_CACHE_DIR / 'llm'
+
+
+def _llm_cache_key(payload):
+    """Stable key over the request's model, prompt text, and image references."""
+    hasher = hashlib.sha256()
+    hasher.update(payload['model'].encode('utf-8'))
+    for part in payload['messages'][0]['content']:
+        if part.get('type') == 'text':
+            hasher.update(part['text'].encode('utf-8'))
+        elif part.get('type') == 'image_url':
+            hasher.update(part['image_url']['url'].encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def _llm_cache_get(key):
+    """Return a cached response dict, or None on miss/corruption."""
+    path = _LLM_CACHE_DIR / f"{key}.json"
+    if path.is_file():
+        try:
+            return orjson.loads(path.read_bytes())
+        except (OSError, json.JSONDecodeError):
+            return None
+    return None
+
+
+def _llm_cache_put(key, response_data):
+    """Atomically persist a response dict for future identical requests."""
+    try:
+        _LLM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path = _LLM_CACHE_DIR / f"{key}.json"
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_bytes(orjson.dumps(response_data))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"  Warning: Could not write LLM cache: {e}")
+
 
-from config import OPENROUTER_API_KEY, OPENROUTER_API_URL, OPENROUTER_MODEL, MAX_IMAGES_PER_POST
+def _write_image_cache(cache_path, compressed_data):
+    """Atomically persist compressed bytes so later runs skip download+compress."""
+    try:
+        IMAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.tmp')
+        tmp_path.write_bytes(compressed_data)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"  Warning: Could not write image cache: {e}")
 
 
 CATEGORY_DETECTION_PROMPT = """
@@ -715,62 +879,259 @@ Here is the metadata for each post (images are attached):
 Return ONLY the JSON object. No markdown code blocks. No explanations.
 """
 
+# The template is ~8KB with hundreds of literal {{...}} braces, so str.format
+# rescans and unescapes the whole thing on every call. Split it once at the
+# single placeholder and unescape the halves; formatting is then one concat.
+_PROMPT_PREFIX, _PROMPT_SUFFIX = (
+    half.replace('{{', '{').replace('}}', '}')
+    for half in ANALYSIS_PROMPT.split('{posts_data}')
+)
+
+
+def _compress_pil_image(img, max_size=800, quality=85):
+    """Resize/convert an already-open PIL image and re-encode it as JPEG."""
+    # For JPEG sources, let libjpeg downscale during decode (1/2, 1/4, 1/8 DCT
+    # scaling) - far cheaper than decoding at full size and resizing after.
+    img.draft('RGB', (max_size, max_size))
+
+    # Convert to RGB if necessary (handles PNG with alpha)
+    if img.mode in ('RGBA', 'P'):
+        img = img.convert('RGB')
+
+    # Resize if larger than max_size (no-op when already small enough)
+    img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+    # Compress to JPEG
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue(), 'image/jpeg'
+
 
 def compress_image(image_data, max_size=800, quality=85):
     """Compress image to reduce payload size."""
     try:
         img = Image.open(BytesIO(image_data))
 
-        # Convert to RGB if necessary (handles PNG with alpha)
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
+        # Fast path: an RGB JPEG already within bounds needs no decode or
+        # re-encode - hand back the original bytes untouched.
+        if img.format == 'JPEG' and img.mode == 'RGB' and max(img.size) <= max_size:
+            return image_data, 'image/jpeg'
 
-        # Resize if larger than max_size
-        if max(img.size) > max_size:
-            ratio = max_size / max(img.size)
-            new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
-
-        # Compress to JPEG
-        buffer = BytesIO()
-        img.save(buffer, format='JPEG', quality=quality, optimize=True)
-        return buffer.getvalue(), 'image/jpeg'
+        return _compress_pil_image(img, max_size, quality)
     except Exception as e:
         print(f"  Warning: Could not compress image: {e}")
         return image_data, 'image/jpeg'
 
 
-def download_image_as_base64(url, max_retries=3):
-    """Download an image from URL with retry logic and compression."""
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, timeout=30)
-            if response.status_code == 200:
-                image_data = response.content
+def _fetch_image_bytes(url):
+    """Download raw image bytes; the session retries transparently."""
+    try:
+        response = _SESSION.get(url, timeout=30)
+        if response.status_code == 200:
+            return response.content
+        print(f"  Warning: Image download returned HTTP {response.status_code}")
+    except Exception as e:
+        print(f"  Warning: Failed to download image: {e}")
+
+    return None
+
+
+def _cached_download(url, max_size):
+    """Return a memoized or disk-cached (base64_data, media_type), or None."""
+    cached = _DOWNLOAD_MEMO.get((url, max_size))
+    if cached is not None:
+        return cached
+
+    cache_path = _image_cache_path(url, max_size)
+    if cache_path.is_file():
+        result = (pybase64.b64encode(cache_path.read_bytes()).decode('ascii'), 'image/jpeg')
+        _DOWNLOAD_MEMO[(url, max_size)] = result
+        return result
+
+    return None
+
+
+def _finish_image(url, max_size, compressed_data, media_type):
+    """Cache and base64-encode freshly compressed image bytes."""
+    _write_image_cache(_image_cache_path(url, max_size), compressed_data)
+    result = (pybase64.b64encode(compressed_data).decode('ascii'), media_type)
+    _DOWNLOAD_MEMO[(url, max_size)] = result
+    return result
+
 
-                # Compress image to reduce payload size
-                compressed_data, media_type = compress_image(image_data)
+def download_image_as_base64(url, max_size=800):
+    """Download an image from URL with compression and caching."""
+    cached = _cached_download(url, max_size)
+    if cached is not None:
+        return cached
 
-                base64_data = base64.b64encode(compressed_data).decode('utf-8')
-                return base64_data, media_type
+    image_data = _fetch_image_bytes(url)
+    if image_data is None:
+        return None, None
 
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                wait_time = (attempt + 1) * 2  # Exponential backoff: 2s, 4s, 6s
-                print(f"  Retry {attempt + 1}/{max_retries} in {wait_time}s...")
-                time.sleep(wait_time)
+    # Compress image to reduce payload size
+    compressed_data, media_type = compress_image(image_data, max_size)
+    return _finish_image(url, max_size, compressed_data, media_type)
+
+
+def download_images_as_base64(image_urls, max_workers=8, max_size=None):
+    """
+    Download a batch of images concurrently.
+
+    Fetches are I/O-bound and run on a thread pool; the CPU-bound
+    resize/re-encode runs on a process pool so multiple cores work on
+    compression at once. When max_size is not given it adapts to the batch:
+    few images keep more detail, many shrink so the combined payload stays
+    under the request byte target. Takes (post_num, img_num, url) tuples and
+    returns {url: (base64_data, media_type)} so callers can rebuild their
+    content arrays in the original order.
+    """
+    unique_urls = {url for _, _, url in image_urls}
+    if max_size is None:
+        max_size = _adaptive_max_size(len(unique_urls))
+    results = {}
+    pending = []
+
+    for url in unique_urls:
+        cached = _cached_download(url, max_size)
+        if cached is not None:
+            results[url] = cached
+        else:
+            pending.append(url)
+
+    if not pending:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as fetch_pool, \
+            ProcessPoolExecutor(max_workers=os.cpu_count()) as compress_pool:
+        fetch_futures = {fetch_pool.submit(_fetch_image_bytes, url): url for url in pending}
+
+        compress_futures = {}
+        for future in as_completed(fetch_futures):
+            url = fetch_futures[future]
+            image_data = future.result()
+            if image_data is None:
+                results[url] = (None, None)
             else:
-                print(f"  Warning: Failed after {max_retries} attempts: {e}")
-        except Exception as e:
-            print(f"  Warning: Failed to download image: {e}")
-            break
+                compress_futures[compress_pool.submit(compress_image, image_data, max_size)] = url
+
+        for future in as_completed(compress_futures):
+            url = compress_futures[future]
+            compressed_data, media_type = future.result()
+            results[url] = _finish_image(url, max_size, compressed_data, media_type)
+
+    return results
+
+
+# Error markers that make retrying the remaining category analyses pointless.
+# Status codes match on word boundaries so digit runs inside unrelated error
+# text (byte counts, request ids) don't classify a transient failure as fatal.
+_FATAL_STATUS_RE = re.compile(r'\b(401|403|429)\b')
+_FATAL_API_MARKERS = ('unauthorized', 'quota', 'invalid api key')
+
+
+def _is_fatal_api_error(exc):
+    """Auth/quota failures affect every request, not just the failing one."""
+    message = str(exc).lower()
+    return (_FATAL_STATUS_RE.search(message) is not None
+            or any(marker in message for marker in _FATAL_API_MARKERS))
+
+
+def _check_cancelled(cancel_event):
+    """Raise if another worker hit a fatal error and requested cancellation."""
+    if cancel_event is not None and cancel_event.is_set():
+        raise Exception("Cancelled: fatal API error in another category analysis")
+
+
+def _stream_chat_response(payload, timeout=120):
+    """
+    POST a chat completion with SSE streaming and collect the full reply.
+
+    Consuming tokens as they arrive means rate limits and truncation surface
+    immediately instead of after the whole body buffers. The accumulated text
+    is returned in the same {'choices': ...} shape as a non-streaming
+    response so callers and the LLM cache are unchanged.
+    """
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+    _RATE_LIMITER.acquire()
+    with _SESSION.post(
+        OPENROUTER_API_URL,
+        headers=headers,
+        json={**payload, "stream": True},
+        stream=True,
+        timeout=timeout,
+    ) as response:
+        if response.status_code != 200:
+            raise Exception(f"OpenRouter API error: {response.text}")
+
+        chunks = []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data: '):
+                continue  # SSE comments / keep-alives
+            data = line[len('data: '):]
+            if data == '[DONE]':
+                break
+            try:
+                event = orjson.loads(data)
+            except json.JSONDecodeError:
+                continue
+            for choice in event.get('choices', ()):
+                delta_text = choice.get('delta', {}).get('content')
+                if delta_text:
+                    chunks.append(delta_text)
 
-    return None, None
+    return {'choices': [{'message': {'content': ''.join(chunks)}}]}
+
+
+def _strip_code_fence(text):
+    """Remove a wrapping markdown code fence from a model reply, if present."""
+    text = text.strip()
+    match = _FENCE_RE.match(text)
+    return match.group(1) if match else text
+
+
+def url_is_fetchable(url, timeout=10):
+    """Check whether a public CDN URL is still fetchable (not 403/expired)."""
+    try:
+        response = _SESSION.head(url, timeout=timeout, allow_redirects=True)
+        return response.status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
+
+def build_image_refs(image_urls, cancel_event=None):
+    """
+    Resolve each unique URL to an image reference for the model gateway:
+    the plain CDN URL when it is still publicly fetchable (the gateway fetches
+    it server-side, so the request body stays small), otherwise a base64 data
+    URL. INLINE_IMAGES forces the base64 path for every image.
+    """
+    image_refs = {}
+
+    if not INLINE_IMAGES:
+        for _, _, url in image_urls:
+            _check_cancelled(cancel_event)
+            if url not in image_refs and url_is_fetchable(url):
+                image_refs[url] = url
+
+    needs_download = [entry for entry in image_urls if entry[2] not in image_refs]
+    if needs_download:
+        _check_cancelled(cancel_event)
+        for url, (base64_data, media_type) in download_images_as_base64(needs_download).items():
+            if base64_data:
+                image_refs[url] = f"data:{media_type};base64,{base64_data}"
+
+    return image_refs
 
 
 def collect_image_urls(posts):
-    """Collect all image URLs from posts."""
+    """Collect all image URLs from posts, deduplicated across posts."""
     image_urls = []
+    seen_urls = set()
 
     for i, post in enumerate(posts, 1):
         post_images = []
@@ -790,8 +1151,12 @@ def collect_image_urls(posts):
 
         post_images = post_images[:MAX_IMAGES_PER_POST]
 
+        # Instagram reuses CDN URLs for reshared media, so the same URL can
+        # show up under several posts - keep only its first occurrence.
         for j, url in enumerate(post_images, 1):
-            image_urls.append((i, j, url))
+            if url not in seen_urls:
+                seen_urls.add(url)
+                image_urls.append((i, j, url))
 
     return image_urls
 
@@ -805,19 +1170,19 @@ def validate_prompt_template(analysis_json):
     issues = []
 
     # Check for hex codes
-    if re.search(r'#[0-9A-Fa-f]{3,8}', prompt):
+    if _HEX_RE.search(prompt):
         issues.append("hex codes (e.g., #FF58C1)")
 
     # Check for percentages
-    if re.search(r'\d+%', prompt):
+    if _PCT_RE.search(prompt):
         issues.append("percentage values (e.g., 8%)")
 
     # Check for degree measurements
-    if re.search(r'-?\d+\s*(degrees?|deg|\u00b0)', prompt, re.IGNORECASE):
+    if _DEG_RE.search(prompt):
         issues.append("degree measurements")
 
     # Check for pixel measurements
-    if re.search(r'\d+\s*px', prompt, re.IGNORECASE):
+    if _PX_RE.search(prompt):
         issues.append("pixel values")
 
     if issues:
@@ -825,7 +1190,7 @@ def validate_prompt_template(analysis_json):
         print("  These may render as visible text. Use descriptive names instead.")
 
 
-def analyze_posts_with_gemini(posts):
+def analyze_posts_with_gemini(posts, use_cache=True):
     """Analyze Instagram posts using Gemini via OpenRouter."""
 
     # Prepare posts metadata - Post 1 is NEWEST
@@ -849,44 +1214,40 @@ def analyze_posts_with_gemini(posts):
     content = []
 
     # Add the text prompt first
-    formatted_prompt = ANALYSIS_PROMPT.format(
-        posts_data=json.dumps(posts_for_analysis, indent=2)
+    formatted_prompt = (
+        _PROMPT_PREFIX
+        + _dumps(posts_for_analysis)
+        + _PROMPT_SUFFIX
     )
     content.append({
         "type": "text",
         "text": formatted_prompt
     })
 
-    # Download and add images as base64
-    print("Downloading images for analysis...")
+    # Resolve images to URL references (or base64 fallbacks) in original order
+    print("Preparing images for analysis...")
+    image_refs = build_image_refs(image_urls)
+
     successful_images = 0
     for post_num, img_num, url in image_urls:
-        print(f"  Downloading Post {post_num}, Image {img_num}...")
-        base64_data, media_type = download_image_as_base64(url)
+        image_ref = image_refs.get(url)
 
-        if base64_data:
+        if image_ref:
             content.append({
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:{media_type};base64,{base64_data}"
+                    "url": image_ref
                 }
             })
             successful_images += 1
         else:
             print(f"  Skipping Post {post_num}, Image {img_num} (download failed)")
 
-    print(f"Successfully downloaded {successful_images}/{len(image_urls)} images")
+    print(f"Successfully prepared {successful_images}/{len(image_urls)} images")
 
     if successful_images == 0:
         raise Exception("No images could be downloaded for analysis")
 
-    print("Sending posts and images to Gemini for analysis...")
-
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
     payload = {
         "model": OPENROUTER_MODEL,
         "messages": [
@@ -897,47 +1258,30 @@ def analyze_posts_with_gemini(posts):
         ]
     }
 
-    # Retry logic for API call
-    max_retries = 3
-    response = None
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(
-                OPENROUTER_API_URL,
-                headers=headers,
-                json=payload,
-                timeout=120  # 2 minute timeout for large payloads
-            )
-            break  # Success, exit retry loop
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                wait_time = (attempt + 1) * 5  # 5s, 10s, 15s
-                print(f"  API connection failed, retry {attempt + 1}/{max_retries} in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                raise Exception(f"API connection failed after {max_retries} attempts: {e}")
+    # Identical (model, prompt, images) requests return the cached response
+    # instead of paying API latency and tokens again.
+    use_cache = use_cache and USE_LLM_CACHE
+    cache_key = _llm_cache_key(payload)
+    response_data = _llm_cache_get(cache_key) if use_cache else None
 
-    if response is None or response.status_code != 200:
-        error_msg = response.text if response else "No response"
-        raise Exception(f"OpenRouter API error: {error_msg}")
+    if response_data is not None:
+        print("Using cached Gemini response")
+    else:
+        print("Sending posts and images to Gemini for analysis...")
+        response_data = _stream_chat_response(payload)
+
+        if use_cache:
+            _llm_cache_put(cache_key, response_data)
 
-    response_data = response.json()
     analysis_text = response_data['choices'][0]['message']['content']
 
     print("Analysis complete!")
 
     # Clean up response - remove markdown if present
-    analysis_text = analysis_text.strip()
-    if analysis_text.startswith("```json"):
-        analysis_text = analysis_text[7:]
-    if analysis_text.startswith("```"):
-        analysis_text = analysis_text[3:]
-    if analysis_text.endswith("```"):
-        analysis_text = analysis_text[:-3]
-    analysis_text = analysis_text.strip()
+    analysis_text = _strip_code_fence(analysis_text)
 
     try:
-        analysis_json = json.loads(analysis_text)
+        analysis_json = orjson.loads(analysis_text)
         validate_prompt_template(analysis_json)
     except json.JSONDecodeError as e:
         print(f"Warning: Could not parse JSON response: {e}")
@@ -947,11 +1291,160 @@ def analyze_posts_with_gemini(posts):
     return analysis_json
 
 
+async def analyze_posts_with_gemini_async(posts, use_cache=True):
+    """
+    Async wrapper for analyze_posts_with_gemini, for callers running an event
+    loop that want several analyses in flight at once via asyncio.gather.
+    Runs the sync pipeline on a worker thread; image downloads inside it
+    already fan out on their own thread pool.
+    """
+    return await asyncio.to_thread(analyze_posts_with_gemini, posts, use_cache)
+
+
+# Rough cap on batched request content before falling back to per-brand calls.
+_MAX_BATCH_CHARS = 200_000
+
+
+def analyze_multiple_brands(posts_by_brand, use_cache=True):
+    """
+    Analyze posts for several brands in a single OpenRouter call.
+
+    The shared ANALYSIS_PROMPT is sent once, followed by a [BRAND: name] block
+    (metadata + images) per brand, which amortizes the round trip, queuing, and
+    prompt prefix across all brands. Falls back to per-brand
+    analyze_posts_with_gemini calls when the batch would be too large.
+    Returns {brand: analysis_json}.
+    """
+    batch_instructions = (
+        "You will analyze Instagram posts for MULTIPLE independent brands in one request.\n"
+        "Each brand is introduced below by a [BRAND: name] text block with its post\n"
+        "metadata, followed by that brand's images in order.\n"
+        "Apply the analysis task to each brand separately, then return ONE JSON object\n"
+        "mapping each brand name to its complete analysis JSON.\n\n"
+    )
+    shared_prompt = (
+        _PROMPT_PREFIX
+        + "(per-brand post metadata follows in the [BRAND] blocks below)"
+        + _PROMPT_SUFFIX
+    )
+
+    content = [{"type": "text", "text": batch_instructions + shared_prompt}]
+    total_chars = len(batch_instructions) + len(shared_prompt)
+
+    for brand, posts in posts_by_brand.items():
+        posts_for_analysis = [
+            dict(zip(_POST_FIELDS, _GET_POST_FIELDS(defaultdict(lambda: 'N/A', post))), post_number=i)
+            for i, post in enumerate(posts, 1)
+        ]
+        image_urls = collect_image_urls(posts)
+        image_refs = build_image_refs(image_urls)
+
+        block = f"[BRAND: {brand}]\nPosts metadata:\n" + _dumps(posts_for_analysis)
+        content.append({"type": "text", "text": block})
+        total_chars += len(block)
+
+        for post_num, img_num, url in image_urls:
+            image_ref = image_refs.get(url)
+            if image_ref:
+                content.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_ref
+                    }
+                })
+                total_chars += len(image_ref)
+
+    if total_chars > _MAX_BATCH_CHARS:
+        print("Batch too large for a single request - analyzing brands individually")
+        return {
+            brand: analyze_posts_with_gemini(posts, use_cache=use_cache)
+            for brand, posts in posts_by_brand.items()
+        }
+
+    print(f"Sending batched analysis for {len(posts_by_brand)} brands to Gemini...")
+
+    payload = {
+        "model": OPENROUTER_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": content
+            }
+        ]
+    }
+
+    use_cache = use_cache and USE_LLM_CACHE
+    cache_key = _llm_cache_key(payload)
+    response_data = _llm_cache_get(cache_key) if use_cache else None
+
+    if response_data is None:
+        response_data = _stream_chat_response(payload)
+        if use_cache:
+            _llm_cache_put(cache_key, response_data)
+
+    analysis_text = response_data['choices'][0]['message']['content']
+
+    # Clean up response - remove markdown if present
+    analysis_text = _strip_code_fence(analysis_text)
+
+    try:
+        batch_json = orjson.loads(analysis_text)
+    except json.JSONDecodeError as e:
+        print(f"Warning: Could not parse batched JSON response: {e}")
+        print("Raw response:", analysis_text[:500])
+        return {"raw_analysis": analysis_text, "error": "Failed to parse JSON"}
+
+    # Re-run any brand the model dropped from the batched output individually.
+    results = {}
+    for brand, posts in posts_by_brand.items():
+        if brand in batch_json:
+            results[brand] = batch_json[brand]
+            validate_prompt_template(results[brand])
+        else:
+            print(f"Warning: brand '{brand}' missing from batch response, analyzing individually")
+            results[brand] = analyze_posts_with_gemini(posts, use_cache=use_cache)
+
+    return results
+
+
 def detect_categories(posts):
     """
     Phase 1: Detect trend categories from posts.
     Returns category metadata including post assignments and universal elements.
     """
+    content = build_category_detection_content(posts)
+
+    print("Sending posts to Gemini for category detection...")
+
+    payload = {
+        "model": OPENROUTER_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": content
+            }
+        ]
+    }
+
+    cache_key = _llm_cache_key(payload)
+    response_data = _llm_cache_get(cache_key) if USE_LLM_CACHE else None
+
+    if response_data is not None:
+        print("Using cached category detection response")
+    else:
+        response_data = _stream_chat_response(payload)
+        if USE_LLM_CACHE:
+            _llm_cache_put(cache_key, response_data)
+
+    category_text = response_data['choices'][0]['message']['content']
+
+    print("Category detection complete!")
+
+    return parse_category_detection(category_text, posts)
+
+
+def build_category_detection_content(posts):
+    """Build the multimodal content array for the phase-1 category prompt."""
     # Prepare posts metadata - Post 1 is NEWEST
     posts_for_analysis = []
     for i, post in enumerate(posts, 1):
@@ -973,93 +1466,46 @@ def detect_categories(posts):
     content = []
 
     # Add the category detection prompt
-    formatted_prompt = CATEGORY_DETECTION_PROMPT + "\n\nHere are the posts to analyze:\n" + json.dumps(posts_for_analysis, indent=2)
+    formatted_prompt = CATEGORY_DETECTION_PROMPT + "\n\nHere are the posts to analyze:\n" + _dumps(posts_for_analysis)
     content.append({
         "type": "text",
         "text": formatted_prompt
     })
 
-    # Download and add images as base64 (use lower resolution for Phase 1 to save tokens)
-    print("Downloading images for category detection...")
+    # Resolve images to URL references (or base64 fallbacks)
+    print("Preparing images for category detection...")
+    image_refs = build_image_refs(image_urls)
+
     successful_images = 0
     for post_num, img_num, url in image_urls:
-        print(f"  Downloading Post {post_num}, Image {img_num}...")
-        base64_data, media_type = download_image_as_base64(url)
+        image_ref = image_refs.get(url)
 
-        if base64_data:
+        if image_ref:
             content.append({
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:{media_type};base64,{base64_data}"
+                    "url": image_ref
                 }
             })
             successful_images += 1
         else:
             print(f"  Skipping Post {post_num}, Image {img_num} (download failed)")
 
-    print(f"Successfully downloaded {successful_images}/{len(image_urls)} images")
+    print(f"Successfully prepared {successful_images}/{len(image_urls)} images")
 
     if successful_images == 0:
         raise Exception("No images could be downloaded for category detection")
 
-    print("Sending posts to Gemini for category detection...")
-
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "model": OPENROUTER_MODEL,
-        "messages": [
-            {
-                "role": "user",
-                "content": content
-            }
-        ]
-    }
-
-    # Retry logic for API call
-    max_retries = 3
-    response = None
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(
-                OPENROUTER_API_URL,
-                headers=headers,
-                json=payload,
-                timeout=120
-            )
-            break
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                wait_time = (attempt + 1) * 5
-                print(f"  API connection failed, retry {attempt + 1}/{max_retries} in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                raise Exception(f"API connection failed after {max_retries} attempts: {e}")
+    return content
 
-    if response is None or response.status_code != 200:
-        error_msg = response.text if response else "No response"
-        raise Exception(f"OpenRouter API error: {error_msg}")
-
-    response_data = response.json()
-    category_text = response_data['choices'][0]['message']['content']
-
-    print("Category detection complete!")
 
+def parse_category_detection(category_text, posts):
+    """Parse a phase-1 reply, falling back to one catch-all category."""
     # Clean up response - remove markdown if present
-    category_text = category_text.strip()
-    if category_text.startswith("```json"):
-        category_text = category_text[7:]
-    if category_text.startswith("```"):
-        category_text = category_text[3:]
-    if category_text.endswith("```"):
-        category_text = category_text[:-3]
-    category_text = category_text.strip()
+    category_text = _strip_code_fence(category_text)
 
     try:
-        category_json = json.loads(category_text)
+        category_json = orjson.loads(category_text)
     except json.JSONDecodeError as e:
         print(f"Warning: Could not parse JSON response: {e}")
         print("Raw response:", category_text[:500])
@@ -1251,33 +1697,18 @@ def build_category_selector(category_data):
     available_categories = [cat['category_id'] for cat in category_data['categories']]
     selection_logic = {}
 
-    # Common keyword patterns for different purposes
-    purpose_keywords = {
-        "call_to_action": ["apply", "join", "recruit", "volunteer", "hiring", "position", "sign up", "register"],
-        "announcement": ["deadline", "announcement", "reminder", "save the date", "upcoming", "launching", "new"],
-        "storytelling": ["story", "impact", "event", "community", "volunteers", "testimonial", "experience"],
-        "educational": ["learn", "guide", "how to", "tips", "tutorial", "facts", "information"],
-        "testimonial": ["testimonial", "review", "feedback", "experience", "story", "success"],
-        "behind_the_scenes": ["behind", "team", "process", "making", "work", "volunteers"],
-        "product": ["product", "service", "feature", "offer", "sale", "discount", "pricing"]
-    }
-
     for cat in category_data['categories']:
         cat_id = cat['category_id']
         cat_name = cat['category_name'].lower()
         cat_desc = cat['category_description'].lower()
         cat_purpose = cat.get('purpose', '').lower()
 
-        # Extract keywords from category name and description
-        keywords = []
-
-        # Add purpose-specific keywords
-        if cat_purpose in purpose_keywords:
-            keywords.extend(purpose_keywords[cat_purpose])
+        # Extract keywords from category name and description, accumulating
+        # into a set so deduplication happens as we go.
+        keywords = set(_PURPOSE_KEYWORDS.get(cat_purpose, ()))
 
         # Add keywords from category name (split by spaces and common separators)
-        name_words = cat_name.replace('-', ' ').replace('_', ' ').split()
-        keywords.extend([word for word in name_words if len(word) > 3])  # Words longer than 3 chars
+        keywords.update(word for word in _NAME_SPLIT_RE.split(cat_name) if len(word) > 3)  # Words longer than 3 chars
 
         # Content indicators from description
         content_indicators = []
@@ -1291,7 +1722,7 @@ def build_category_selector(category_data):
             content_indicators.append("nature or landscape themes")
 
         selection_logic[cat_id] = {
-            "keywords": list(set(keywords)),  # Remove duplicates
+            "keywords": list(keywords),
             "content_indicators": content_indicators,
             "purpose": cat_purpose
         }
@@ -1302,13 +1733,20 @@ def build_category_selector(category_data):
     }
 
 
+def _shared_analysis_sections(category_data, category_analyses):
+    """Result sections shared by the categorized and fallback assembly paths."""
+    return {
+        "universal_design_elements": extract_universal_elements(category_data, category_analyses),
+        "cross_category_patterns": infer_cross_category_patterns(category_analyses),
+        "generation_category_selector": build_category_selector(category_data)
+    }
+
+
 def assemble_final_json(category_data, category_analyses, posts):
     """
     Combine Phase 1 + Phase 2 results.
     Add analysis_metadata, universal_design_elements, cross_category_patterns, generation_category_selector.
     """
-    from datetime import datetime
-
     primary_category_id = category_data['categories'][0]['category_id'] if category_data['categories'] else None
     primary_category = category_data['categories'][0] if category_data['categories'] else None
 
@@ -1353,37 +1791,42 @@ def assemble_final_json(category_data, category_analyses, posts):
             }
         },
         "categories": category_analyses,
-        "universal_design_elements": extract_universal_elements(category_data, category_analyses),
-        "cross_category_patterns": infer_cross_category_patterns(category_analyses),
-        "generation_category_selector": build_category_selector(category_data)
+        **_shared_analysis_sections(category_data, category_analyses)
     }
 
 
-def analyze_category_with_gemini(posts, category_metadata):
+def analyze_category_with_gemini(posts, category_metadata, cancel_event=None):
     """
     Phase 2: Analyze a specific category's design system.
     Takes posts filtered to a single category and the category metadata from Phase 1.
+    Polls cancel_event before each blocking step so a fatal error elsewhere
+    aborts this worker instead of waiting out its full timeout.
     """
     category_id = category_metadata['category_id']
     category_name = category_metadata['category_name']
     category_description = category_metadata['category_description']
 
+    # Compute the cache key before any prompt or image work so a hit
+    # short-circuits the whole function.
+    post_ids = [post.get('url') for post in posts]
+    image_urls = collect_image_urls(posts)
+    cache_key = hashlib.sha256(
+        repr((category_id, post_ids, image_urls, PROMPT_VERSION)).encode('utf-8')
+    ).hexdigest()
+
+    cached = _ANALYSIS_CACHE.get(cache_key)
+    if cached is not None:
+        print(f"Phase 2: Using cached analysis for category '{category_name}'")
+        return _merge_category_metadata(dict(cached), category_metadata, posts)
+
     print(f"Phase 2: Analyzing category '{category_name}' ({len(posts)} posts)...")
 
     # Prepare posts metadata
-    posts_for_analysis = []
-    for i, post in enumerate(posts, 1):
-        post_data = {
-            "post_number": i,
-            "url": post.get('url', 'N/A'),
-            "caption": post.get('caption', 'N/A'),
-            "type": post.get('type', 'N/A'),
-            "timestamp": post.get('timestamp', 'N/A')
-        }
-        posts_for_analysis.append(post_data)
+    posts_for_analysis = [
+        dict(zip(_POST_FIELDS, _GET_POST_FIELDS(defaultdict(lambda: 'N/A', post))), post_number=i)
+        for i, post in enumerate(posts, 1)
+    ]
 
-    # Collect all image URLs for this category's posts
-    image_urls = collect_image_urls(posts)
     print(f"  Found {len(image_urls)} images for this category")
 
     # Build multimodal content array
@@ -1398,8 +1841,12 @@ Category description: {category_description}
 Focus your analysis on the design patterns specific to this category.
 """
 
-    formatted_prompt = category_context + "\n" + ANALYSIS_PROMPT.format(
-        posts_data=json.dumps(posts_for_analysis, indent=2)
+    formatted_prompt = (
+        category_context
+        + "\n"
+        + _PROMPT_PREFIX
+        + _dumps(posts_for_analysis)
+        + _PROMPT_SUFFIX
     )
 
     content.append({
@@ -1407,17 +1854,19 @@ Focus your analysis on the design patterns specific to this category.
         "text": formatted_prompt
     })
 
-    # Download and add images as base64
-    print("  Downloading images for analysis...")
+    # Resolve images to URL references (or base64 fallbacks)
+    print("  Preparing images for analysis...")
+    image_refs = build_image_refs(image_urls, cancel_event)
+
     successful_images = 0
     for post_num, img_num, url in image_urls:
-        base64_data, media_type = download_image_as_base64(url)
+        image_ref = image_refs.get(url)
 
-        if base64_data:
+        if image_ref:
             content.append({
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:{media_type};base64,{base64_data}"
+                    "url": image_ref
                 }
             })
             successful_images += 1
@@ -1427,13 +1876,9 @@ Focus your analysis on the design patterns specific to this category.
     if successful_images == 0:
         raise Exception(f"No images could be downloaded for category '{category_name}'")
 
+    _check_cancelled(cancel_event)
     print(f"  Sending to Gemini for analysis...")
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
     payload = {
         "model": OPENROUTER_MODEL,
         "messages": [
@@ -1444,57 +1889,41 @@ Focus your analysis on the design patterns specific to this category.
         ]
     }
 
-    # Retry logic for API call
-    max_retries = 3
-    response = None
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(
-                OPENROUTER_API_URL,
-                headers=headers,
-                json=payload,
-                timeout=120
-            )
-            break
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                wait_time = (attempt + 1) * 5
-                print(f"    API connection failed, retry {attempt + 1}/{max_retries} in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                raise Exception(f"API connection failed after {max_retries} attempts: {e}")
+    llm_cache_key = _llm_cache_key(payload)
+    response_data = _llm_cache_get(llm_cache_key) if USE_LLM_CACHE else None
 
-    if response is None or response.status_code != 200:
-        error_msg = response.text if response else "No response"
-        raise Exception(f"OpenRouter API error: {error_msg}")
+    if response_data is not None:
+        print(f"  Using cached response for category '{category_name}'")
+    else:
+        response_data = _stream_chat_response(payload)
+        if USE_LLM_CACHE:
+            _llm_cache_put(llm_cache_key, response_data)
 
-    response_data = response.json()
     analysis_text = response_data['choices'][0]['message']['content']
 
     print(f"  Analysis complete for category '{category_name}'")
 
     # Clean up response - remove markdown if present
-    analysis_text = analysis_text.strip()
-    if analysis_text.startswith("```json"):
-        analysis_text = analysis_text[7:]
-    if analysis_text.startswith("```"):
-        analysis_text = analysis_text[3:]
-    if analysis_text.endswith("```"):
-        analysis_text = analysis_text[:-3]
-    analysis_text = analysis_text.strip()
+    analysis_text = _strip_code_fence(analysis_text)
 
     try:
-        analysis_json = json.loads(analysis_text)
+        analysis_json = orjson.loads(analysis_text)
         validate_prompt_template(analysis_json)
+        _ANALYSIS_CACHE[cache_key] = dict(analysis_json)
     except json.JSONDecodeError as e:
         print(f"  Warning: Could not parse JSON response: {e}")
         print("  Raw response:", analysis_text[:500])
         analysis_json = {"raw_analysis": analysis_text, "error": "Failed to parse JSON"}
 
+    return _merge_category_metadata(analysis_json, category_metadata, posts)
+
+
+def _merge_category_metadata(analysis_json, category_metadata, posts):
+    """Attach Phase 1 category metadata to a parsed Phase 2 analysis."""
     # Add category metadata to the analysis
-    analysis_json['category_id'] = category_id
-    analysis_json['category_name'] = category_name
-    analysis_json['category_description'] = category_description
+    analysis_json['category_id'] = category_metadata['category_id']
+    analysis_json['category_name'] = category_metadata['category_name']
+    analysis_json['category_description'] = category_metadata['category_description']
     analysis_json['posts_included'] = category_metadata.get('post_assignments', [])
     analysis_json['post_count'] = len(posts)
     analysis_json['purpose'] = category_metadata.get('purpose', 'unknown')
@@ -1533,15 +1962,14 @@ Focus your analysis on the design patterns specific to this category.
     return analysis_json
 
 
-def analyze_posts_with_categories(posts):
+def analyze_posts_with_categories(posts, category_data=None):
     """
     Full two-phase analysis with category detection and per-category analysis.
-    1. Detect categories (Phase 1)
+    1. Detect categories (Phase 1) - skipped when category_data is supplied,
+       e.g. when phase 1 ran offline through the Batch API
     2. Analyze each category in parallel (Phase 2)
     3. Assemble final JSON structure
     """
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-
     print("=" * 60)
     print("STARTING TWO-PHASE CATEGORY ANALYSIS")
     print("=" * 60)
@@ -1551,13 +1979,16 @@ def analyze_posts_with_categories(posts):
     print("=" * 60)
     print("PHASE 1: CATEGORY DETECTION")
     print("=" * 60)
-    category_data = detect_categories(posts)
+    if category_data is None:
+        category_data = detect_categories(posts)
+    else:
+        print("Using precomputed category detection results")
 
     if 'categories' not in category_data or len(category_data['categories']) == 0:
         print("Warning: No categories detected, falling back to single analysis")
         # Fallback: analyze all posts as one category
         analysis = analyze_posts_with_gemini(posts)
-        return {
+        fallback_result = {
             "analysis_metadata": {
                 "total_posts_analyzed": len(posts),
                 "categories_detected": 1,
@@ -1576,10 +2007,11 @@ def analyze_posts_with_categories(posts):
                     **analysis
                 }
             ],
-            "universal_design_elements": extract_universal_elements(category_data, [analysis]),
-            "cross_category_patterns": {},
-            "generation_category_selector": {"available_categories": ["fallback_single_category"], "selection_logic": {}}
+            **_shared_analysis_sections(category_data, [analysis])
         }
+        # Detection failed, so the selector has no real categories to offer.
+        fallback_result["generation_category_selector"]["available_categories"] = ["fallback_single_category"]
+        return fallback_result
 
     num_categories = len(category_data['categories'])
     print(f"\nDetected {num_categories} categories:")
@@ -1593,9 +2025,11 @@ def analyze_posts_with_categories(posts):
     print("=" * 60)
 
     category_analyses = []
+    cancel_event = threading.Event()
 
-    # Use ThreadPoolExecutor for parallel API calls
-    with ThreadPoolExecutor(max_workers=min(num_categories, 3)) as executor:  # Max 3 parallel requests
+    # Use ThreadPoolExecutor for parallel API calls; total time approaches the
+    # slowest single category instead of the sum, up to the configured cap.
+    with ThreadPoolExecutor(max_workers=min(num_categories, LLM_MAX_CONCURRENCY)) as executor:
         future_to_category = {}
 
         for category_metadata in category_data['categories']:
@@ -1603,7 +2037,7 @@ def analyze_posts_with_categories(posts):
             category_posts = filter_posts_by_category(posts, category_metadata)
 
             # Submit analysis task
-            future = executor.submit(analyze_category_with_gemini, category_posts, category_metadata)
+            future = executor.submit(analyze_category_with_gemini, category_posts, category_metadata, cancel_event)
             future_to_category[future] = category_metadata['category_name']
 
         # Collect results as they complete
@@ -1613,8 +2047,21 @@ def analyze_posts_with_categories(posts):
                 category_analysis = future.result()
                 category_analyses.append(category_analysis)
                 print(f"  [OK] Completed analysis for: {category_name}")
+            except CancelledError:
+                print(f"  [CANCELLED] Skipped category '{category_name}' after fatal error")
+                category_analyses.append({
+                    "category_name": category_name,
+                    "error": "Cancelled after fatal API error",
+                    "note": "Analysis failed for this category"
+                })
             except Exception as e:
                 print(f"  [ERROR] Error analyzing category '{category_name}': {e}")
+                # Auth/quota errors doom the remaining calls too - abort them
+                # now instead of letting each wait out its own timeout.
+                if _is_fatal_api_error(e) and not cancel_event.is_set():
+                    print("  Fatal API error - cancelling remaining category analyses")
+                    cancel_event.set()
+                    executor.shutdown(wait=False, cancel_futures=True)
                 # Add fallback empty analysis
                 category_analyses.append({
                     "category_name": category_name,
@@ -1653,4 +2100,4 @@ if __name__ == "__main__":
     ]
 
     result = analyze_posts_with_gemini(test_posts)
-    print(json.dumps(result, indent=2))
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
@@ -1,17 +1,48 @@
-import json
+import argparse
+import asyncio
+import hashlib
+import os
 from datetime import datetime
+from pathlib import Path
+
+import orjson
 
 from apify_scraper import scrape_instagram_posts
-from gemini_analyzer import analyze_posts_with_categories
+from batch import collect_batch_results, load_saved_job_id, submit_gemini_batch
+from gemini_analyzer import (
+    analyze_posts_with_categories,
+    build_category_detection_content,
+    parse_category_detection,
+)
 from config import OUTPUT_DIR
+from summarize import print_summary
+
+
+def _unlink_quiet(path):
+    """Delete a file, tolerating it already being gone."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _unlink_all(paths):
+    """Delete files on worker threads so the unlink(2) calls overlap."""
+    async def _run():
+        await asyncio.gather(*(asyncio.to_thread(_unlink_quiet, path) for path in paths))
+
+    if paths:
+        asyncio.run(_run())
 
 
 def clear_output_directory():
     """Clear all files from the output directory."""
     if OUTPUT_DIR.exists():
-        for file in OUTPUT_DIR.iterdir():
-            if file.is_file():
-                file.unlink()
+        # scandir's DirEntry carries the file type from readdir, so no extra
+        # stat(2) per entry like Path.iterdir + is_file.
+        with os.scandir(OUTPUT_DIR) as entries:
+            files = [entry.path for entry in entries if entry.is_file()]
+        _unlink_all(files)
         print("Cleared previous output files")
     OUTPUT_DIR.mkdir(exist_ok=True)
 
@@ -19,29 +50,145 @@ def clear_output_directory():
 def clear_design_analysis_only():
     """Clear only design_analysis files, keep raw_posts."""
     if OUTPUT_DIR.exists():
-        for file in OUTPUT_DIR.iterdir():
-            if file.is_file() and file.name.startswith("design_analysis_"):
-                file.unlink()
+        with os.scandir(OUTPUT_DIR) as entries:
+            files = [
+                entry.path for entry in entries
+                if entry.name.startswith("design_analysis_") and entry.is_file()
+            ]
+        _unlink_all(files)
         print("Cleared previous design analysis files")
 
 
+def dump_json_array(path, items):
+    """
+    Stream-encode items to path as a JSON array, one record at a time.
+    Peak memory stays at one serialized record instead of the whole dump;
+    the output is a normal JSON array, so readers are unaffected.
+    Returns (record_count, sha256 hexdigest) of the written bytes.
+    """
+    hasher = hashlib.sha256()
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(b'[\n')
+        hasher.update(b'[\n')
+        for i, item in enumerate(items):
+            if i:
+                f.write(b',\n')
+                hasher.update(b',\n')
+            encoded = orjson.dumps(item)
+            f.write(encoded)
+            hasher.update(encoded)
+            count += 1
+        f.write(b'\n]')
+        hasher.update(b'\n]')
+    return count, hasher.hexdigest()
+
+
+def _manifest_path(raw_posts_file):
+    """Sidecar manifest path for a raw_posts file."""
+    return raw_posts_file.with_name(f"{raw_posts_file.stem}.manifest.json")
+
+
+def save_raw_posts(raw_posts_file, posts):
+    """Write a raw_posts file plus its tiny manifest (count, content hash)."""
+    count, digest = dump_json_array(raw_posts_file, posts)
+    _manifest_path(raw_posts_file).write_bytes(orjson.dumps({
+        "count": count,
+        "hash": digest,
+        "created_at": datetime.now().isoformat(),
+    }))
+
+
 def get_latest_raw_posts():
-    """Find and load the most recent raw_posts file."""
+    """
+    Find the most recent raw_posts file.
+    Returns (post_count, loader) or None; the loader parses the file on
+    first call, so startup only reads the sub-200-byte manifest and a
+    rescrape never pays for deserializing data it throws away.
+    """
     if not OUTPUT_DIR.exists():
         return None
 
-    raw_posts_files = list(OUTPUT_DIR.glob("raw_posts_*.json"))
-    if not raw_posts_files:
+    # Find the most recent file; scandir reuses readdir's cached stat data
+    # instead of a stat(2) syscall per glob match.
+    latest = None
+    with os.scandir(OUTPUT_DIR) as entries:
+        for entry in entries:
+            if (entry.name.startswith("raw_posts_") and entry.name.endswith(".json")
+                    and not entry.name.endswith(".manifest.json") and entry.is_file()):
+                mtime = entry.stat().st_mtime
+                if latest is None or mtime > latest[0]:
+                    latest = (mtime, entry.path)
+
+    if latest is None:
         return None
 
-    # Get the most recent file
-    latest_file = max(raw_posts_files, key=lambda p: p.stat().st_mtime)
+    latest_file = Path(latest[1])
+
+    def load_posts():
+        # One read(2) of the whole file beats json.load's buffered chunking.
+        posts = orjson.loads(latest_file.read_bytes())
+        print(f"Loaded existing data from: {latest_file.name}")
+        return posts
+
+    manifest = _manifest_path(latest_file)
+    if manifest.is_file():
+        count = orjson.loads(manifest.read_bytes()).get("count")
+        if count is not None:
+            return count, load_posts
 
-    with open(latest_file, 'r', encoding='utf-8') as f:
-        posts = json.load(f)
+    # Older runs have no manifest; fall back to a full parse.
+    posts = load_posts()
+    return len(posts), lambda: posts
 
-    print(f"Loaded existing data from: {latest_file.name}")
-    return posts
+
+def run_batch_submit():
+    """Submit phase-1 category detection through the Batch API and exit."""
+    existing = get_latest_raw_posts()
+    if existing is None:
+        print("No existing data found. Scraping fresh posts...")
+        OUTPUT_DIR.mkdir(exist_ok=True)
+        posts = scrape_instagram_posts()
+        raw_posts_file = OUTPUT_DIR / f"raw_posts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        save_raw_posts(raw_posts_file, posts)
+        print(f"Raw posts saved to: {raw_posts_file}")
+    else:
+        _, load_posts = existing
+        posts = load_posts()
+
+    content = build_category_detection_content(posts)
+    job_id = submit_gemini_batch([content])
+    print(f"Submitted batch job: {job_id}")
+    print(f"Collect results later with: python main.py --collect {job_id}")
+
+
+def run_batch_collect(job_id):
+    """Collect a batch job's phase-1 results and run phase 2 on them."""
+    existing = get_latest_raw_posts()
+    if existing is None:
+        print("No scraped data found - the batch was submitted against data that is gone.")
+        return
+    _, load_posts = existing
+    posts = load_posts()
+
+    job_id = job_id or load_saved_job_id()
+    if not job_id:
+        print("No job id given and no saved batch job found.")
+        return
+
+    print(f"Collecting batch job {job_id}...")
+    results = collect_batch_results(job_id)
+    category_data = parse_category_detection(results['request-1'], posts)
+
+    try:
+        analysis = analyze_posts_with_categories(posts, category_data=category_data)
+    except Exception as e:
+        print(f"Error analyzing posts: {e}")
+        return
+
+    analysis_file = OUTPUT_DIR / f"design_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    analysis_file.write_bytes(orjson.dumps(analysis, option=orjson.OPT_INDENT_2))
+    print(f"Design analysis saved to: {analysis_file}")
 
 
 def main():
@@ -57,17 +204,22 @@ def main():
     print("=" * 60)
     print()
 
-    # Check if existing data is available
-    existing_posts = get_latest_raw_posts()
+    # One timestamp per run so raw posts and analysis files share a name.
+    run_ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    # Check if existing data is available. The manifest gives us the post
+    # count up front; the file itself only gets parsed if we keep it.
+    existing = get_latest_raw_posts()
     rescrape = True
 
-    if existing_posts is not None:
-        print(f"Found existing data with {len(existing_posts)} posts.")
+    if existing is not None:
+        post_count, load_posts = existing
+        print(f"Found existing data with {post_count} posts.")
         user_input = input("Do you want to RESCRAPE the data? (y/n): ").strip().lower()
 
         if user_input in ['n', 'no']:
             rescrape = False
-            posts = existing_posts
+            posts = load_posts()
             print("Using existing scraped data")
             # Only clear design analysis files
             clear_design_analysis_only()
@@ -92,10 +244,9 @@ def main():
             print(f"Error scraping posts: {e}")
             return
 
-        # Save raw posts data
-        raw_posts_file = OUTPUT_DIR / f"raw_posts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(raw_posts_file, 'w', encoding='utf-8') as f:
-            json.dump(posts, f, indent=2, ensure_ascii=False)
+        # Save raw posts data (compact - this file is read by machines, not people)
+        raw_posts_file = OUTPUT_DIR / f"raw_posts_{run_ts}.json"
+        save_raw_posts(raw_posts_file, posts)
         print(f"Raw posts saved to: {raw_posts_file}")
         print()
     else:
@@ -119,9 +270,8 @@ def main():
     print()
     print("STEP 3: Saving analysis results...")
     print("-" * 60)
-    analysis_file = OUTPUT_DIR / f"design_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(analysis_file, 'w', encoding='utf-8') as f:
-        json.dump(analysis, f, indent=2, ensure_ascii=False)
+    analysis_file = OUTPUT_DIR / f"design_analysis_{run_ts}.json"
+    analysis_file.write_bytes(orjson.dumps(analysis, option=orjson.OPT_INDENT_2))
     print(f"Design analysis saved to: {analysis_file}")
 
     # Print summary
@@ -138,82 +288,23 @@ def main():
     print()
 
     # Print a preview of the analysis
-    if isinstance(analysis, dict):
-        # Check for new categorized structure
-        if 'categories' in analysis and 'analysis_metadata' in analysis:
-            metadata = analysis['analysis_metadata']
-            print("Category Analysis Summary:")
-            print("-" * 60)
-            print(f"  Categories detected: {metadata.get('categories_detected', 0)}")
-            print(f"  Primary category: {metadata.get('primary_category', 'N/A')}")
-            print()
-
-            # Display recommendation
-            if 'recommended_category_for_generation' in metadata:
-                rec = metadata['recommended_category_for_generation']
-                print("RECOMMENDED CATEGORY FOR GENERATION:")
-                print(f"  Category: {rec.get('category_id', 'N/A')}")
-                print(f"  Confidence: {rec.get('confidence', 'unknown')}")
-                print(f"  Reasoning: {rec.get('reasoning', 'N/A')}")
-                print()
-
-            # Print each category
-            for i, cat in enumerate(analysis['categories'], 1):
-                print(f"Category {i}: {cat.get('category_name', 'Unknown')}")
-                print(f"  Posts: {cat.get('post_count', 0)} ({', '.join(map(str, cat.get('posts_included', [])))})")
-                print(f"  Purpose: {cat.get('purpose', 'Unknown')}")
-
-                # Print logo consistency if available
-                if 'consistency_tracking' in cat:
-                    logo_info = cat['consistency_tracking'].get('logo_placement', {})
-                    print(f"  Logo: {logo_info.get('consistency_score', 'Unknown')}")
-
-                # Print design system canvas info if available
-                if 'design_system' in cat and 'canvas' in cat['design_system']:
-                    canvas = cat['design_system']['canvas']
-                    print(f"  Canvas: {canvas.get('width', '?')}x{canvas.get('height', '?')}")
-
-                print()
-
-            # Print universal elements if available
-            if 'universal_design_elements' in analysis:
-                universal = analysis['universal_design_elements']
-                print("Universal Elements (across all posts):")
-                print("-" * 60)
-
-                if 'canvas' in universal and universal['canvas'].get('consistent'):
-                    canvas = universal['canvas']
-                    print(f"  Canvas: {canvas.get('width', 0)}x{canvas.get('height', 0)} (CONSISTENT)")
-
-                if 'fonts' in universal and universal['fonts'].get('consistent'):
-                    fonts = universal['fonts'].get('universal_fonts', [])
-                    print(f"  Fonts: {', '.join(fonts)} (CONSISTENT)")
-
-                if 'logo' in universal and universal['logo'].get('consistent_position'):
-                    logo_pos = universal['logo'].get('universal_position', 'unknown')
-                    print(f"  Logo: Always {logo_pos} (CONSISTENT)")
-
-                print()
-        # Fallback for old structure (backward compatibility)
-        elif 'design_system' in analysis:
-            ds = analysis['design_system']
-            print("Design System Summary:")
-            print("-" * 60)
-            if 'canvas' in ds:
-                print(f"  Canvas: {ds['canvas'].get('width', '?')}x{ds['canvas'].get('height', '?')} ({ds['canvas'].get('aspect_ratio', '?')})")
-            if 'colors' in ds:
-                colors = ds['colors']
-                print(f"  Colors:")
-                for name, color in list(colors.items())[:3]:  # Limit to first 3 colors
-                    if isinstance(color, dict):
-                        print(f"    {name}: {color.get('name', '?')} ({color.get('hex', '?')})")
-            if 'typography' in ds and 'headline' in ds['typography']:
-                print(f"  Headline Font: {ds['typography']['headline'].get('font_family', '?')}")
-            print()
+    print_summary(analysis)
 
     print()
     print("All done!")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Instagram post design pattern analyzer")
+    parser.add_argument('--batch', action='store_true',
+                        help="submit category detection via the Batch API and exit")
+    parser.add_argument('--collect', metavar='JOB_ID', nargs='?', const='',
+                        help="collect a batch job's results and run phase 2 (defaults to the last submitted job)")
+    args = parser.parse_args()
+
+    if args.batch:
+        run_batch_submit()
+    elif args.collect is not None:
+        run_batch_collect(args.collect)
+    else:
+        main()
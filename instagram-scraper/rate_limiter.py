@@ -0,0 +1,34 @@
+"""Thread-safe sliding-window rate limiter for outbound API calls."""
+
+import threading
+import time
+from collections import deque
+
+
+class RateLimiter:
+    """
+    Caps calls per rolling window; acquire() blocks until a slot frees.
+
+    Staying under the provider's RPM limit means bursts of parallel category
+    analyses never draw 429s in the first place; anything that still slips
+    through is retried by the session's Retry policy.
+    """
+
+    def __init__(self, max_calls, period=60.0):
+        self.max_calls = max_calls
+        self.period = period
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request slot is available, then claim it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= self.period:
+                    self._calls.popleft()
+                if len(self._calls) < self.max_calls:
+                    self._calls.append(now)
+                    return
+                wait_time = self.period - (now - self._calls[0])
+            time.sleep(wait_time)
@@ -0,0 +1,88 @@
+"""Console summary printers for completed design analyses."""
+
+
+def print_categorized(analysis):
+    """Summarize the two-phase categorized analysis structure."""
+    metadata = analysis['analysis_metadata']
+    print("Category Analysis Summary:")
+    print("-" * 60)
+    print(f"  Categories detected: {metadata.get('categories_detected', 0)}")
+    print(f"  Primary category: {metadata.get('primary_category', 'N/A')}")
+    print()
+
+    # Display recommendation
+    if 'recommended_category_for_generation' in metadata:
+        rec = metadata['recommended_category_for_generation']
+        print("RECOMMENDED CATEGORY FOR GENERATION:")
+        print(f"  Category: {rec.get('category_id', 'N/A')}")
+        print(f"  Confidence: {rec.get('confidence', 'unknown')}")
+        print(f"  Reasoning: {rec.get('reasoning', 'N/A')}")
+        print()
+
+    # Print each category
+    for i, cat in enumerate(analysis['categories'], 1):
+        print(f"Category {i}: {cat.get('category_name', 'Unknown')}")
+        print(f"  Posts: {cat.get('post_count', 0)} ({', '.join(map(str, cat.get('posts_included', [])))})")
+        print(f"  Purpose: {cat.get('purpose', 'Unknown')}")
+
+        # Print logo consistency if available
+        if 'consistency_tracking' in cat:
+            logo_info = cat['consistency_tracking'].get('logo_placement', {})
+            print(f"  Logo: {logo_info.get('consistency_score', 'Unknown')}")
+
+        # Print design system canvas info if available
+        if 'design_system' in cat and 'canvas' in cat['design_system']:
+            canvas = cat['design_system']['canvas']
+            print(f"  Canvas: {canvas.get('width', '?')}x{canvas.get('height', '?')}")
+
+        print()
+
+    # Print universal elements if available
+    if 'universal_design_elements' in analysis:
+        universal = analysis['universal_design_elements']
+        print("Universal Elements (across all posts):")
+        print("-" * 60)
+
+        if 'canvas' in universal and universal['canvas'].get('consistent'):
+            canvas = universal['canvas']
+            print(f"  Canvas: {canvas.get('width', 0)}x{canvas.get('height', 0)} (CONSISTENT)")
+
+        if 'fonts' in universal and universal['fonts'].get('consistent'):
+            fonts = universal['fonts'].get('universal_fonts', [])
+            print(f"  Fonts: {', '.join(fonts)} (CONSISTENT)")
+
+        if 'logo' in universal and universal['logo'].get('consistent_position'):
+            logo_pos = universal['logo'].get('universal_position', 'unknown')
+            print(f"  Logo: Always {logo_pos} (CONSISTENT)")
+
+        print()
+
+
+def print_legacy(analysis):
+    """Summarize the pre-category single design_system structure."""
+    ds = analysis['design_system']
+    print("Design System Summary:")
+    print("-" * 60)
+    if 'canvas' in ds:
+        print(f"  Canvas: {ds['canvas'].get('width', '?')}x{ds['canvas'].get('height', '?')} ({ds['canvas'].get('aspect_ratio', '?')})")
+    if 'colors' in ds:
+        colors = ds['colors']
+        print(f"  Colors:")
+        for name, color in list(colors.items())[:3]:  # Limit to first 3 colors
+            if isinstance(color, dict):
+                print(f"    {name}: {color.get('name', '?')} ({color.get('hex', '?')})")
+    if 'typography' in ds and 'headline' in ds['typography']:
+        print(f"  Headline Font: {ds['typography']['headline'].get('font_family', '?')}")
+    print()
+
+
+def print_summary(analysis):
+    """Dispatch to the printer matching the analysis structure."""
+    if not isinstance(analysis, dict):
+        return
+
+    if 'categories' in analysis and 'analysis_metadata' in analysis:
+        print_categorized(analysis)
+    # Fallback for old structure (backward compatibility)
+    elif 'design_system' in analysis:
+        print_legacy(analysis)